@@ -6,6 +6,7 @@ import time
 from datetime import datetime
 import os
 import signal
+import fcntl
 
 import logging
 from logging import Logger
@@ -84,6 +85,69 @@ class LinkTuple(NamedTuple):
 GET_LINK_JS = (Path(__file__).parent / "js/get_links.js").read_text()
 
 
+def temp_profile_parent(chrome_profile_path: Path, num_browsers: int) -> Optional[str]:
+    """
+    Returns /dev/shm if it has enough free space for the copies of the given profile
+    of all browsers running in parallel.
+    Keeping the temporary profile on tmpfs means that chrome does all profile I/O in memory.
+    Otherwise returns None to use the default temporary directory.
+    """
+    if not os.path.isdir("/dev/shm"):
+        return None
+
+    profile_size = sum(
+        f.stat().st_size for f in chrome_profile_path.rglob("*") if f.is_file()
+    )
+    # Chrome keeps writing to the profile while crawling
+    if shutil.disk_usage("/dev/shm").free < 4 * profile_size * num_browsers:
+        return None
+    return "/dev/shm"
+
+
+def _clone_file(src: str, dst: str) -> None:
+    """
+    Copies the file as a reflink on filesystems that support it (e.g. Btrfs, XFS),
+    which shares the data until chrome modifies the copy. Otherwise copies it.
+    """
+    try:
+        with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+            fcntl.ioctl(dst_file.fileno(), fcntl.FICLONE, src_file.fileno())
+        shutil.copystat(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def clone_profile(src: Path, dst: Path) -> None:
+    """
+    Copies the chrome profile at src to dst. Files are cloned instead of hardlinked
+    as chrome modifies some of them in place, which must not alter the original profile.
+    """
+    shutil.copytree(
+        src,
+        dst,
+        copy_function=_clone_file,
+        ignore_dangling_symlinks=True,
+    )
+
+
+def patch_chromedriver(chromedriver_path: Path) -> None:
+    """
+    Patches the chromedriver executable and copies it to the directory of the patcher.
+    Holds an exclusive lock next to the executable so that concurrent callers wait
+    for the patch instead of modifying the binary at the same time.
+    """
+    with open(chromedriver_path.with_suffix(".lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            patcher = Patcher(executable_path=str(chromedriver_path), version_main=126)
+            patcher.auto()
+
+            Path(Patcher.data_path).mkdir(parents=True, exist_ok=True)
+            shutil.copy(chromedriver_path, Patcher.data_path)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
 def post_load_routine(func: FuncT, browser_init: Optional[Browser] = None) -> FuncT:
     """
     Collects cookies and dismisses alert windows after the decorated function is run
@@ -409,6 +473,24 @@ class Browser(ABC):
                     raise e
                 self.logger.info("Timed out when executing script")
 
+    def prefetch(self, url: URL) -> None:
+        """
+        Hints the browser to fetch the given URL in the background
+        so that loading it afterwards is faster. Only a hint, so failures are not retried.
+        """
+        try:
+            self.driver.execute_script(
+                "if (document.head) {"
+                "  var l = document.createElement('link');"
+                "  l.rel = 'prefetch';"
+                "  l.href = arguments[0];"
+                "  document.head.appendChild(l);"
+                "}",
+                url.to_text(),
+            )
+        except WebDriverException as e:
+            self.logger.debug("Unable to prefetch %s: %s", url, type(e))
+
     @post_load_routine
     def _press_key(self, key: Any) -> None:
         """
@@ -693,7 +775,7 @@ class CBConsentCrawlerBrowser(Browser):
 
     def bot_mitigation(
         self,
-        max_sleep_seconds: int = 7,
+        max_sleep_seconds: float = 7,
         prob_scrolling: float = 0.8,
         num_mouse_moves=10,
     ) -> None:
@@ -735,11 +817,7 @@ class CBConsentCrawlerBrowser(Browser):
         if max_sleep_seconds <= RANDOM_SLEEP_LOW:
             time.sleep(max_sleep_seconds)
         else:
-            time.sleep(
-                prandom.randrange(
-                    min(RANDOM_SLEEP_LOW, max_sleep_seconds), max_sleep_seconds
-                )
-            )
+            time.sleep(prandom.uniform(RANDOM_SLEEP_LOW, max_sleep_seconds))
         self.logger.info("Random sleep finished.")
 
 
@@ -755,6 +833,8 @@ class Chrome(CBConsentCrawlerBrowser):
         use_temp: bool = True,
         intercept_network: bool = True,
         headless: bool = True,
+        page_load_timeout: float = 23,
+        temp_profile_dir: Optional[str] = None,
         *args: Any,
         **kwargs: Any,
     ) -> None:
@@ -763,6 +843,8 @@ class Chrome(CBConsentCrawlerBrowser):
 
         Args:
             use_temp (bool, optional): If a temporary directory should be used for the profile data which will be altered. Defaults to True.
+            page_load_timeout (float, optional): Seconds to wait for a page to load before it is reported as timed out. Defaults to 23.
+            temp_profile_dir (str, optional): Parent directory of the temporary profile, see temp_profile_parent. Defaults to the system's temporary directory.
         """
         super().__init__(
             seconds_before_processing_page=seconds_before_processing_page,
@@ -775,18 +857,21 @@ class Chrome(CBConsentCrawlerBrowser):
         # By default we use a temporary directory to always have a fresh chrome profile
         if self.use_temp:
             rand_str = ''.join(prandom.SystemRandom().choice(string.ascii_uppercase + string.digits) for _ in range(6))
-            self._temp_dir = tempfile.TemporaryDirectory(prefix="enfbots_", suffix=rand_str, ignore_cleanup_errors=True, delete=True)
+            self._temp_dir = tempfile.TemporaryDirectory(
+                prefix="enfbots_",
+                suffix=rand_str,
+                dir=temp_profile_dir,
+                ignore_cleanup_errors=True,
+                delete=True,
+            )
             self.profile_path = Path(self._temp_dir.name) / "chrome_profile"
 
             # copy profile to the temporary directory
-            shutil.copytree(
-                chrome_profile_path,
-                self.profile_path,
-                ignore_dangling_symlinks=True,
-            )
+            clone_profile(chrome_profile_path, self.profile_path)
         else:
             self.profile_path = chrome_profile_path
         self.headless = headless
+        self.page_load_timeout = page_load_timeout
 
         self.chrome_path = Path(chrome_path)
         self.driver_path = chromedriver_path
@@ -869,10 +954,11 @@ class Chrome(CBConsentCrawlerBrowser):
             fix_hairline=True,
         )
 
-        # Time to wait when calling driver.get
-        self.driver.set_page_load_timeout(23)
-        self.driver.set_script_timeout(25)
-        self.driver.implicitly_wait(27)
+        # Time to wait when calling driver.get; a timeout is reported as PageState.TIMEOUT
+        # instead of relying on the worker being killed
+        self.driver.set_page_load_timeout(self.page_load_timeout)
+        self.driver.set_script_timeout(self.page_load_timeout + 2)
+        self.driver.implicitly_wait(self.page_load_timeout + 4)
 
         self.driver.add_cdp_listener(
             "Network.responseReceived", self._handle_cdp_response_received
@@ -880,6 +966,50 @@ class Chrome(CBConsentCrawlerBrowser):
 
         return self
 
+    def load_pages_in_tabs(self, urls: List[URL]) -> None:
+        """
+        Opens the URLs in new background tabs at once so that they load concurrently.
+        Afterwards each tab is activated to wait for its page, run a short bot
+        mitigation and close it. The previously active tab is activated again.
+        """
+        original_handle = self.driver.current_window_handle
+        previous_handles = set(self.driver.window_handles)
+
+        for url in urls:
+            self.driver.execute_cdp_cmd(
+                "Target.createTarget", {"url": url.to_text(), "background": True}
+            )
+
+        try:
+            for handle in self.driver.window_handles:
+                if handle in previous_handles:
+                    continue
+
+                self.driver.switch_to.window(handle)
+                try:
+                    WebDriverWait(self.driver, self.page_load_timeout).until(
+                        lambda d: d.execute_script("return document.readyState")
+                        == "complete"
+                    )
+                    self.bot_mitigation(
+                        max_sleep_seconds=prandom.uniform(0.2, 0.8), num_mouse_moves=2
+                    )
+                except TimeoutException:
+                    self.logger.warning("Timeout on tab: %s", handle)
+                except WebDriverException as e:
+                    self.logger.warning("Failed to visit tab %s: %s", handle, type(e))
+                finally:
+                    # Alerts and beforeunload dialogs would prevent closing the tab
+                    try:
+                        self.dismiss_dialogs()
+                        self.driver.close()
+                    except WebDriverException as e:
+                        self.logger.warning(
+                            "Unable to close tab %s: %s", handle, type(e)
+                        )
+        finally:
+            self.driver.switch_to.window(original_handle)
+
     def _handle_cdp_response_received(self, data: Any) -> None:
         """
         This function is analogous to _process_intercepted_request but is directly called
@@ -176,6 +176,7 @@ class CookiebotCMP(AbstractCMP):
                         cat_id=cat_id,
                         cat_name=cat_name,
                         visit=visit,
+                        visit_id=visit.visit_id,
                         browser_id=visit.browser_id,
                         purpose=purpose,
                         expiry=expiry,
@@ -623,6 +623,7 @@ class OnetrustCMP(AbstractCMP):
                                     cat_id=cat_id,
                                     cat_name=cat_name,
                                     visit=visit,
+                                    visit_id=visit.visit_id,
                                     browser_id=self.browser_id,
                                     purpose=purpose,
                                     expiry=expiry,
@@ -658,6 +659,7 @@ class OnetrustCMP(AbstractCMP):
                                         cat_id=cat_id,
                                         cat_name=cat_name,
                                         visit=visit,
+                                        visit_id=visit.visit_id,
                                         browser_id=self.browser_id,
                                         purpose=purpose,
                                         expiry=expiry,
@@ -874,6 +876,7 @@ class OnetrustCMP(AbstractCMP):
                             cat_name=cat_name,
                             browser_id=self.browser_id,
                             visit=visit,
+                            visit_id=visit.visit_id,
                             purpose=cdesc,
                             expiry=cexpiry,
                             type_name=None,
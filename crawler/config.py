@@ -0,0 +1,21 @@
+"""
+Paths used by the consent crawler and its pool workers.
+All paths are relative to the working directory of the crawler.
+"""
+
+from pathlib import Path
+
+log_dir = Path("./logs")
+log_dir.mkdir(exist_ok=True)
+
+chrome_profile_path = Path("./chrome_profile/")
+# Identifies the profile tar the current profile was extracted from
+chrome_profile_stamp_path = Path("./chrome_profile.stamp")
+chromedriver_path = Path("./chromedriver/chromedriver")
+chrome_path = Path("./chrome/")
+
+# Version of the chrome binary in chrome_path, keyed by the binary's modification time
+chrome_version_cache_path = chrome_path / ".chrome_version"
+
+# Websites that should be crawled again are appended to this list
+retry_list_path = Path("./collected_data/retry_list.txt")
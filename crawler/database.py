@@ -1,10 +1,12 @@
 import logging
-from typing import Optional, Tuple
+from typing import Any, Optional, Tuple
 from pathlib import Path
 from datetime import datetime
 
 import alembic.config
 import alembic.command
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
 import psycopg2
 
 from sqlalchemy import (
@@ -19,6 +21,7 @@ from sqlalchemy import (
     desc,
     text,
     create_engine,
+    event,
 )
 from sqlalchemy.orm import (
     Mapped,
@@ -193,6 +196,22 @@ class ConsentCrawlResult(Base):
     report: Mapped[Optional[str]]
 
 
+def _set_sqlite_pragmas(dbapi_connection: Any, connection_record: Any) -> None:
+    """
+    Configures each new SQLite connection. The write-ahead log allows reading while
+    results are written and only needs a sync at checkpoints, the busy timeout waits
+    for locks instead of failing with 'database is locked'.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.execute("PRAGMA cache_size=-65536")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
 def initialize_base_db(
     db_url: str,
     alembic_root_dir: Path,
@@ -203,16 +222,28 @@ def initialize_base_db(
     logger.info("Creating database connection to %s", db_url)
     engine = create_engine(db_url, pool_size=pool_size)
 
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+
     SessionLocal.configure(bind=engine)
 
     if create:
-        logger.info("Creating initial database structure")
-        Base.metadata.create_all(bind=engine, checkfirst=True)
         config = alembic.config.Config(file_=str(alembic_root_dir / "alembic.ini"))
 
         config.set_main_option("sqlalchemy.url", db_url)
         config.set_main_option("script_location", str(alembic_root_dir / "alembic"))
         config.attributes["configure_logger"] = False
+
+        # Existing databases (e.g. postgres) that are already at head need no changes
+        head = ScriptDirectory.from_config(config).get_current_head()
+        with engine.connect() as connection:
+            current = MigrationContext.configure(connection).get_current_revision()
+        if current is not None and current == head:
+            logger.info("Database is already at revision %s", head)
+            return
+
+        logger.info("Creating initial database structure")
+        Base.metadata.create_all(bind=engine, checkfirst=True)
         alembic.command.stamp(config, "head")
 
         logger.info("Created database.")
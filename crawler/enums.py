@@ -32,6 +32,16 @@ class CookieTuple(NamedTuple):
     same_site: str
 
 
+class BrowserProcess(NamedTuple):
+    """
+    Processes started for the browser of one visit
+    """
+    visit_id: int
+    browser_pid: int
+    driver_pid: int
+    started: float  # timestamp after both processes were started
+
+
 class CookieCategory(IntEnum):
     """ ICC categories """
     UNRECOGNIZED = -1  # A class that is not unclassified but which the crawler cannot identify.
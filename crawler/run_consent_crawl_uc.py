@@ -4,33 +4,56 @@ import argparse
 import os
 import sys
 import re
-from itertools import repeat
 from logging import Logger
-from typing import List, Tuple, Dict, cast
+from typing import List, NamedTuple, Optional, Set, Tuple, Dict, cast
 import logging
+from logging.handlers import QueueHandler, QueueListener
+import multiprocessing
+import multiprocessing.managers
+import multiprocessing.synchronize
 from datetime import datetime
 from pathlib import Path
 from importlib.metadata import version
 import time
+import gc
 import traceback
 import tarfile
 import shutil
+import signal
+import socket
+import queue
+import subprocess
+import threading
 import random
 import json
 import psutil
+from concurrent.futures import CancelledError, Future, as_completed
 from urllib.parse import urlparse
 
 from tqdm import tqdm
-from multiprocessing import Process
 from psutil import TimeoutExpired
-from pebble import ProcessPool
+from pebble import ProcessExpired, ProcessPool
 from selenium.common.exceptions import WebDriverException
-from sqlalchemy import select
-from sqlalchemy.orm import joinedload
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
 from hyperlink import URL
 import urllib3
 
-from crawler.browser import Chrome
+from crawler.config import (
+    log_dir,
+    chrome_profile_path,
+    chrome_profile_stamp_path,
+    chromedriver_path,
+    chrome_path,
+    chrome_version_cache_path,
+    retry_list_path,
+)
+from crawler.browser import (
+    Chrome,
+    LinkTuple,
+    patch_chromedriver,
+    temp_profile_parent,
+)
 from crawler.database import (
     initialize_base_db,
     SiteVisit,
@@ -42,8 +65,8 @@ from crawler.database import (
     ConsentCrawlResult,
     Cookie,
 )
-from crawler.utils import set_log_formatter, is_on_same_domain
-from crawler.enums import CrawlerType, CrawlState, PageState
+from crawler.utils import set_log_formatter, get_domain
+from crawler.enums import BrowserProcess, CrawlerType, CrawlState, PageState
 
 
 class CrawlerException(Exception):
@@ -55,14 +78,115 @@ class ArgumentsException(Exception):
     Indicates that the configuration is incalid and therefore we cannot start the crawl.
     """
 
-log_dir = Path("./logs")
-log_dir.mkdir(exist_ok=True)
+ver = version("cookieblock-consent-crawler")
 
-chrome_profile_path = Path("./chrome_profile/")
-chromedriver_path = Path("./chromedriver/chromedriver")
-chrome_path = Path("./chrome/")
 
-ver = version("cookieblock-consent-crawler")
+class CrawlSettings(NamedTuple):
+    """
+    Settings shared by all visits of a crawl.
+    """
+
+    browser_id: int
+    crawl: Crawl
+    browser_params: Dict
+    no_stdout: bool
+    num_subpages: int
+    parallel_subpages: int
+    debug_resources: bool
+
+
+# Results of one visit: the crawl result, the declared consents and the collected cookies
+VisitResult = Tuple[ConsentCrawlResult, List[ConsentData], List[Cookie]]
+
+# Used by the handlers of the crawler logger
+crawler_log_formatter = logging.Formatter(
+    "%(asctime)s %(levelname)s %(name)s %(processName)s: %(message)s",
+    "%Y-%m-%d %H:%M:%S",
+)
+
+# Shared by the handlers of all visits of a process
+visit_log_formatter = logging.Formatter(
+    fmt="%(asctime)s %(levelname)s %(filename)s %(name)s %(processName)s: %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+visit_stdout_handler = logging.StreamHandler()
+visit_stdout_handler.setFormatter(visit_log_formatter)
+
+# Set in each process that visits websites, pool workers receive them once in their initializer
+crawl_settings: Optional[CrawlSettings] = None
+
+# Set in each process that starts browsers; the main process collects the reported processes
+browser_process_queue: Optional[queue.Queue[Optional[BrowserProcess]]] = None
+
+# Seconds to wait for the threads that read from the manager queues when stopping them
+queue_reader_stop_timeout = 10
+
+# Seconds between two checks of the watcher and between two scans of all processes
+watcher_interval = 10
+watcher_scan_interval = 60
+
+# Websites that failed with this report are appended to the retry list
+retry_report_prefix = "Failure: TimeoutError"
+
+# Matches the version printed by `chrome --version`
+chrome_version_pattern = re.compile(r"^Chromium\s+([\d.]+)")
+
+
+def _prefetch_dns(url: str) -> None:
+    """
+    Resolves the host of the given URL in a background thread
+    so that the lookup is cached when the browser loads the URL.
+    """
+    if not (url.startswith("http://") or url.startswith("https://")):
+        url = "https://" + url
+    host = urlparse(url).hostname
+    if not host:
+        return
+
+    def resolve() -> None:
+        try:
+            socket.getaddrinfo(host, 443)
+        except OSError:
+            pass
+
+    threading.Thread(target=resolve, daemon=True).start()
+
+
+def _count_fds() -> int:
+    """
+    Returns the number of open file descriptors of this process
+    by listing them instead of inspecting every single one.
+    """
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except FileNotFoundError:
+        return psutil.Process().num_fds()
+
+
+def _close_crawl_logger(logger: Logger, listener: QueueListener) -> None:
+    """
+    Writes the remaining log records to the log file and closes and removes
+    all handlers of the visit logger.
+    """
+    listener.stop()
+    for handler in [*logger.handlers, *listener.handlers]:
+        logger.removeHandler(handler)
+        # The stdout handler is shared between visits
+        if handler is not visit_stdout_handler:
+            handler.close()
+
+
+def _log_open_resources(logger: Logger) -> None:
+    """
+    Logs the open files and connections of this process. Expensive as every
+    file descriptor and socket is inspected, thus only used with --debug-resources.
+    """
+    proc = psutil.Process()
+    open_files = proc.open_files()
+    logger.info("Number of open files: %s", len(open_files))
+    for f in open_files:
+        logger.info("\tOpen file: %s", f)
+    logger.info("Number of connections: %s", len(proc.net_connections()))
 
 
 def run_domain(
@@ -72,6 +196,8 @@ def run_domain(
     crawl: Crawl,
     browser_params: Dict,
     num_subpages: int = 10,
+    debug_resources: bool = False,
+    parallel_subpages: int = 1,
 ) -> Tuple[ConsentCrawlResult, List[ConsentData], List[Cookie]]:
     """ """
     url = visit.site_url
@@ -83,19 +209,22 @@ def run_domain(
     crawl_logger = logging.getLogger(f"visit-{visit.visit_id}")
     crawl_logger.propagate = False
 
-    file_handler = logging.FileHandler(log_dir / f"visit_{visit_id}.log", delay=False)
-    log_formatter = logging.Formatter(
-        fmt="%(asctime)s %(levelname)s %(filename)s %(name)s %(processName)s: %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S",
+    file_handler = logging.FileHandler(log_dir / f"visit_{visit_id}.log")
+    file_handler.setFormatter(visit_log_formatter)
+
+    # The log file is written by a listener thread to not block the crawl.
+    # Records are written right away so that the log of a killed worker shows
+    # where its visit stopped.
+    visit_log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    visit_log_listener = QueueListener(
+        visit_log_queue, file_handler, respect_handler_level=True
     )
-    file_handler.setFormatter(log_formatter)
-    crawl_logger.addHandler(file_handler)
+    visit_log_listener.start()
+    crawl_logger.addHandler(QueueHandler(visit_log_queue))
 
     # Only add stdout as handler if desired
     if not no_stdout:
-        stdout_handler = logging.StreamHandler()
-        stdout_handler.setFormatter(log_formatter)
-        crawl_logger.addHandler(stdout_handler)
+        crawl_logger.addHandler(visit_stdout_handler)
 
     crawl_logger.setLevel(logging.INFO)
     crawl_logger.info("CookieBlock-ConsentCrawler version %s", ver)
@@ -105,119 +234,159 @@ def run_domain(
         url = "https://" + url
 
     crawl_logger.info("Working on %s", url)
-    file_handler.flush()
 
-    with Chrome(
-        seconds_before_processing_page=1,
-        chrome_profile_path=chrome_profile_path,
-        chromedriver_path=chromedriver_path,
-        browser_id=browser_id,
-        crawl=crawl,
-        logger=crawl_logger,
-        **browser_params,  # type: ignore
-    ) as browser:
-        u = URL.from_text(url)
-
-        page_state = browser.load_page(u)
-
-        if page_state in [PageState.HTTP_ERROR, PageState.WRONG_URL]:
-            crawl_logger.warning("Unable to connect to %s due to: %s", u, page_state)
-            u = URL.from_text(url.replace("https://", "http://"))
-
-        crawl_logger.info(
-            "Loaded website %s (chrome pid: %s, chromedriver: %s) with status %s",
-            u,
-            browser.driver.browser_pid,
-            browser.driver.service.process.pid,
-            page_state,
-        )
+    try:
+        with Chrome(
+            seconds_before_processing_page=1,
+            chrome_profile_path=chrome_profile_path,
+            chromedriver_path=chromedriver_path,
+            browser_id=browser_id,
+            crawl=crawl,
+            logger=crawl_logger,
+            **browser_params,  # type: ignore
+        ) as browser:
+            u = URL.from_text(url)
 
-        # Add all PIDs of the browser and chromedriver to the queue
-        now = datetime.now()
+            page_state = browser.load_page(u)
 
-        # bot mitigation
-        crawl_logger.info("Calling bot mitigation")
-        browser.bot_mitigation(max_sleep_seconds=1)
+            if page_state in [PageState.HTTP_ERROR, PageState.WRONG_URL]:
+                crawl_logger.warning(
+                    "Unable to connect to %s due to: %s", url, page_state
+                )
+                u = URL.from_text(url.replace("https://", "http://"))
 
-        crawler_type, crawler_state, consent_data, result = browser.crawl_cmps(
-            visit=visit
-        )
+            # Serialize the URL only once for all log records of this visit
+            url_text = u.to_text()
 
-        if crawler_type == CrawlerType.FAILED or crawler_state != CrawlState.SUCCESS:
-            browser.collect_cookies(visit=visit)
             crawl_logger.info(
-                "Aborted crawl crawl to %s [crawl_type: %s; crawler_state: %s]",
-                u,
-                crawler_type.name,
-                crawler_state.name,
-            )
-
-            # Close file handler
-            for handler in crawl_logger.handlers:
-                if isinstance(handler, logging.FileHandler):
-                    handler.close()
-            return (result, consent_data, [])
-
-        crawl_logger.info(
-            "Ran %s CMP: %s (Found %s consents)",
-            crawler_type.name,
-            crawler_state.name,
-            len(consent_data),
-        )
-        browser.load_page(u)
-
-        # visit subpages
-        links = list(
-            filter(
-                lambda x: is_on_same_domain(x.url.to_text(), url),
-                browser.get_links(),
+                "Loaded website %s (chrome pid: %s, chromedriver: %s) with status %s",
+                url_text,
+                browser.driver.browser_pid,
+                browser.driver.service.process.pid,
+                page_state,
             )
-        )
-        crawl_logger.info("Found %s links", len(links))
-
-        chosen = random.choices(links, k=min(num_subpages, len(links)))
-        for i, l in enumerate(chosen):
-            crawl_logger.info("Subvisiting [%i]: %s", i, l.url.to_text())
-            browser.load_page(l.url)
-            browser.bot_mitigation(max_sleep_seconds=1, num_mouse_moves=2)
 
-        cookies = browser.collect_cookies(visit=visit)
-
-        crawl_logger.info("Sucessfully finished crawl to %s", u)
+            # Add all PIDs of the browser and chromedriver to the queue
+            now = datetime.now()
+            if browser_process_queue is not None:
+                browser_process_queue.put(
+                    BrowserProcess(
+                        visit_id=visit_id,
+                        browser_pid=browser.driver.browser_pid,
+                        driver_pid=browser.driver.service.process.pid,
+                        started=now.timestamp(),
+                    )
+                )
 
-        proc = psutil.Process()
-        # To detect resource leakage
-        crawl_logger.info("Number of open files: %s", len(proc.open_files()))
-        for f in proc.open_files():
-            crawl_logger.info("\tOpen file: %s", f)
-        crawl_logger.info("Number of connections: %s", len(proc.net_connections()))
-        crawl_logger.info("fds: %s", proc.num_fds())
+            # bot mitigation
+            crawl_logger.info("Calling bot mitigation")
+            browser.bot_mitigation(max_sleep_seconds=1)
 
-        crawl_logger.info("End of crawl to %s", u)
+            crawler_type, crawler_state, consent_data, result = browser.crawl_cmps(
+                visit=visit
+            )
 
-        # Close file handler
-        for handler in crawl_logger.handlers:
-            if isinstance(handler, logging.FileHandler):
-                handler.close()
-                crawl_logger.removeHandler(handler)
-        crawl_logger.info("End(2) of crawl to %s", u)
+            if crawler_type == CrawlerType.FAILED or crawler_state != CrawlState.SUCCESS:
+                browser.collect_cookies(visit=visit)
+                crawl_logger.info(
+                    "Aborted crawl crawl to %s [crawl_type: %s; crawler_state: %s]",
+                    url_text,
+                    crawler_type.name,
+                    crawler_state.name,
+                )
+                return (result, consent_data, [])
 
-        return (result, consent_data, cookies)
+            crawl_logger.info(
+                "Ran %s CMP: %s (Found %s consents)",
+                crawler_type.name,
+                crawler_state.name,
+                len(consent_data),
+            )
+            browser.load_page(u)
+
+            # visit subpages
+            site_domain = get_domain(u.host)
+            links = [
+                l
+                for l in browser.get_links()
+                if l.url.host and get_domain(l.url.host) == site_domain
+            ]
+            crawl_logger.info("Found %s links", len(links))
+
+            # Navigation links usually appear multiple times on the same page,
+            # links that only differ in their fragment or a trailing slash load the same page
+            seen_links: Set[str] = set()
+            unique_links: List[LinkTuple] = []
+            for l in links:
+                link_text = l.url.replace(fragment="").to_text().rstrip("/")
+                if link_text not in seen_links:
+                    seen_links.add(link_text)
+                    unique_links.append(l)
+            links = unique_links
+            crawl_logger.info("Found %s unique links", len(links))
+
+            # Sample without replacement to not visit the same subpage twice
+            chosen = random.sample(links, k=min(num_subpages, len(links)))
+
+            if parallel_subpages > 1:
+                # Subpages are loaded concurrently in groups of tabs
+                for start in range(0, len(chosen), parallel_subpages):
+                    group = chosen[start : start + parallel_subpages]
+                    crawl_logger.info(
+                        "Subvisiting [%i-%i] in parallel: %s",
+                        start,
+                        start + len(group) - 1,
+                        ", ".join(l.url.to_text() for l in group),
+                    )
+                    browser.load_pages_in_tabs([l.url for l in group])
+            else:
+                for i, l in enumerate(chosen):
+                    crawl_logger.info("Subvisiting [%i]: %s", i, l.url)
+                    browser.load_page(l.url)
+
+                    # Fetch the next subpage while waiting in the bot mitigation
+                    if i + 1 < len(chosen):
+                        browser.prefetch(chosen[i + 1].url)
+
+                    # The landing page already had the full bot mitigation
+                    browser.bot_mitigation(
+                        max_sleep_seconds=random.uniform(0.2, 0.8), num_mouse_moves=2
+                    )
+
+            cookies = browser.collect_cookies(visit=visit)
+
+            crawl_logger.info("Sucessfully finished crawl to %s", url_text)
+
+            # To detect resource leakage
+            crawl_logger.info("fds: %s", _count_fds())
+            if debug_resources and crawl_logger.isEnabledFor(logging.INFO):
+                _log_open_resources(crawl_logger)
+
+            crawl_logger.info("End of crawl to %s", url_text)
+
+            return (result, consent_data, cookies)
+    finally:
+        # Write the remaining log records and close the log file
+        _close_crawl_logger(crawl_logger, visit_log_listener)
 
 
 def run_domain_with_timeout(
     visit: SiteVisit,
-    browser_id: int,
-    no_stdout: bool,
-    crawl: Crawl,
-    browser_params: Dict,
 ) -> Tuple[ConsentCrawlResult, List[ConsentData], List[Cookie]]:
     logger = logging.getLogger("cookieblock-consent-crawler")
+    assert crawl_settings is not None
 
     try:
-        url = visit.site_url
-
-        return run_domain(visit, browser_id, no_stdout, crawl, browser_params)
+        return run_domain(
+            visit,
+            crawl_settings.browser_id,
+            crawl_settings.no_stdout,
+            crawl_settings.crawl,
+            crawl_settings.browser_params,
+            num_subpages=crawl_settings.num_subpages,
+            debug_resources=crawl_settings.debug_resources,
+            parallel_subpages=crawl_settings.parallel_subpages,
+        )
     except (
         TimeoutError,
         WebDriverException,  # selenium
@@ -226,17 +395,12 @@ def run_domain_with_timeout(
         TimeoutExpired,
     ) as e:
         logger.warning("Website %s had an exception (%s)", visit.site_url, type(e))
-        # This except block should store the websites for later to retry them
-
-        with open("./collected_data/retry_list.txt", "a", encoding="utf-8") as file:
-            file.write(url)
-            file.write("\n")
-
+        # The main process stores these websites for later to retry them
         return (
             ConsentCrawlResult(
-                report=f"Failure: TimeoutError: {visit.site_url}",
-                browser=visit.browser,
-                visit=visit,
+                report=f"{retry_report_prefix}: {visit.site_url}",
+                browser_id=visit.browser_id,
+                visit_id=visit.visit_id,
                 cmp_type=CrawlerType.FAILED.value,
                 crawl_state=CrawlState.LIBRARY_ERROR.value,
             ),
@@ -254,14 +418,107 @@ def run_domain_with_timeout(
         return (
             ConsentCrawlResult(
                 report=f"Failure: {str(e)}",
-                browser=visit.browser,
-                visit=visit,
+                browser_id=visit.browser_id,
+                visit_id=visit.visit_id,
                 cmp_type=CrawlerType.FAILED.value,
                 crawl_state=CrawlState.LIBRARY_ERROR.value,
             ),
             [],
             [],
         )
+    finally:
+        # Workers are reused for several visits, release the objects of this visit
+        gc.collect()
+        logger.info(
+            "Worker memory after visit %s: %.0f MiB",
+            visit.visit_id,
+            psutil.Process().memory_info().rss / 2**20,
+        )
+
+
+def _store_results(session: Session, batch: List[VisitResult]) -> None:
+    """
+    Inserts the results of several visits. All rows are new, so each table
+    gets a single INSERT executed for all of its rows instead of merging
+    the objects one by one, which first selects every single row.
+    """
+    crawl_results = [crawl_result for crawl_result, _, _ in batch]
+    consent_data = [cd for _, cds, _ in batch for cd in cds]
+    cookies = [cookie for _, _, visit_cookies in batch for cookie in visit_cookies]
+
+    for model, objects in (
+        (ConsentCrawlResult, crawl_results),
+        (ConsentData, consent_data),
+        (Cookie, cookies),
+    ):
+        if not objects:
+            continue
+
+        # The primary keys are assigned by the database
+        columns = [c.key for c in model.__table__.columns if not c.primary_key]
+        session.execute(
+            insert(model), [{c: getattr(o, c) for c in columns} for o in objects]
+        )
+
+
+def _write_results(
+    result_queue: queue.SimpleQueue[Optional[VisitResult]],
+    commit_every: int,
+    unstored: List[int],
+) -> None:
+    """
+    Stores the results put on the queue until None is received.
+    Results are committed in batches of at most `commit_every` visits or
+    as soon as no more results are waiting. If a batch fails, its visits are
+    stored one by one and the ids of the visits that still fail are appended
+    to `unstored`.
+    """
+    logger = logging.getLogger("cookieblock-consent-crawler")
+    batch: List[VisitResult] = []
+
+    while True:
+        item = result_queue.get()
+        if item is not None:
+            batch.append(item)
+
+        if batch and (
+            item is None
+            or len(batch) >= commit_every
+            or result_queue.empty()
+        ):
+            try:
+                with SessionLocal.begin() as session:
+                    _store_results(session, batch)
+            except Exception as e:
+                logger.warning(
+                    "Unable to store the results of %s visits together (%s)",
+                    len(batch),
+                    type(e),
+                )
+                for visit_result in batch:
+                    try:
+                        with SessionLocal.begin() as session:
+                            _store_results(session, [visit_result])
+                    except Exception as e:
+                        logger.error(
+                            "Unable to store the results of visit %s",
+                            visit_result[0].visit_id,
+                        )
+                        logger.exception(e)
+                        unstored.append(visit_result[0].visit_id)
+            batch = []
+
+        if item is None:
+            return
+
+
+def _needs_retry(crawl_result: ConsentCrawlResult) -> bool:
+    """
+    Whether the crawl failed due to a timeout or browser error and should be retried.
+    """
+    return bool(crawl_result.report) and str(crawl_result.report).startswith(
+        retry_report_prefix
+    )
 
 
 def _setup_logger():
@@ -271,14 +528,18 @@ def _setup_logger():
     set_log_formatter(
         logger, "%(asctime)s %(levelname)s %(name)s: %(message)s", "%Y-%m-%d %H:%M:%S"
     )
-    log_formatter = logging.Formatter(
-        "%(asctime)s %(levelname)s %(name)s %(processName)s: %(message)s",
-        "%Y-%m-%d %H:%M:%S",
-    )
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(log_formatter)
-    console_handler.setLevel(logging.INFO)
-    logger.addHandler(console_handler)
+    # Only attach the console handler once, otherwise every record
+    # is formatted and written multiple times.
+    if not any(isinstance(h, logging.StreamHandler) for h in logger.handlers):
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(crawler_log_formatter)
+        console_handler.setLevel(logging.INFO)
+        logger.addHandler(console_handler)
+
+        file_handler = logging.FileHandler(log_dir / "crawler.log")
+        file_handler.setFormatter(crawler_log_formatter)
+        file_handler.setLevel(logging.INFO)
+        logger.addHandler(file_handler)
     logger.setLevel(logging.INFO)
 
     logger.info("Starting cookieblock-consent-crawler version %s", ver)
@@ -288,6 +549,198 @@ def _setup_logger():
     return logger
 
 
+def _start_manager() -> multiprocessing.managers.SyncManager:
+    """
+    Starts the manager that holds the log and browser process queues shared with
+    the pool workers.
+    Pebble kills workers that time out. A killed worker may hold the lock of a
+    multiprocessing.Queue, which then blocks all other writers. A manager queue
+    only loses the connection of the killed worker.
+    The manager ignores SIGINT so that the queues remain usable while stopping.
+    """
+    manager = multiprocessing.managers.SyncManager()
+    manager.start(signal.signal, (signal.SIGINT, signal.SIG_IGN))
+    return manager
+
+
+def _start_log_listener(
+    logger: Logger, manager: multiprocessing.managers.SyncManager
+) -> Tuple[queue.Queue[logging.LogRecord], QueueListener]:
+    """
+    Moves the handlers of the crawler logger to a listener thread.
+    The crawler logger of this process and of all pool workers only enqueue
+    the records; the actual console and disk writes happen in the listener.
+
+    Returns:
+        The queue the records are sent to and the started listener.
+    """
+    log_queue: queue.Queue[logging.LogRecord] = manager.Queue()
+
+    listener = QueueListener(log_queue, *logger.handlers, respect_handler_level=True)
+    logger.handlers = [QueueHandler(log_queue)]
+    listener.start()
+
+    return log_queue, listener
+
+
+def _pin_to_cpu(cpu_lock: multiprocessing.synchronize.Lock) -> int:
+    """
+    Pins the current process to the CPU with the fewest other pool workers
+    pinned to it. Chromedriver and chrome inherit the affinity when started.
+    The lock is held until the process is pinned so that workers started
+    at the same time do not all choose the same CPU.
+
+    Returns:
+        int: The CPU this process is pinned to.
+    """
+    cpus = sorted(os.sched_getaffinity(0))
+    num_pinned = {cpu: 0 for cpu in cpus}
+
+    current = psutil.Process()
+    parent = current.parent()
+
+    with cpu_lock:
+        siblings = parent.children() if parent else []
+
+        for sibling in siblings:
+            if sibling.pid == current.pid:
+                continue
+            try:
+                affinity = sibling.cpu_affinity()
+            except psutil.NoSuchProcess:
+                continue
+            if len(affinity) == 1 and affinity[0] in num_pinned:
+                num_pinned[affinity[0]] += 1
+
+        cpu = min(cpus, key=lambda c: num_pinned[c])
+        os.sched_setaffinity(0, {cpu})
+    return cpu
+
+
+def _init_worker(
+    log_queue: queue.Queue[logging.LogRecord],
+    process_queue: queue.Queue[Optional[BrowserProcess]],
+    settings: CrawlSettings,
+    cpu_lock: Optional[multiprocessing.synchronize.Lock],
+) -> None:
+    """
+    Initializer of each pool worker. Sends the records of the crawler
+    logger to the listener in the main process and optionally pins the
+    worker to a CPU. The started browser processes are reported to the
+    main process through the process queue. Workers are only pinned
+    if a cpu_lock is given.
+    The worker leads its own process group which is inherited by chromedriver and chrome.
+    """
+    global browser_process_queue, crawl_settings
+    browser_process_queue = process_queue
+    crawl_settings = settings
+
+    os.setpgrp()
+
+    logger = logging.getLogger("cookieblock-consent-crawler")
+    logger.propagate = False
+    logger.handlers = [QueueHandler(log_queue)]
+    logger.setLevel(logging.INFO)
+
+    if cpu_lock is not None:
+        logger.info("Pinned worker to CPU %s", _pin_to_cpu(cpu_lock))
+
+
+def _collect_browser_processes(
+    process_queue: queue.Queue[Optional[BrowserProcess]],
+    browser_processes: Dict[int, BrowserProcess],
+) -> None:
+    """
+    Adds the browser processes reported by the workers until None is received.
+    """
+    while (browser_process := process_queue.get()) is not None:
+        browser_processes[browser_process.visit_id] = browser_process
+
+
+def _running_pids() -> Set[int]:
+    """
+    Returns the PIDs of all running processes with a single listing of /proc.
+    """
+    return {int(pid) for pid in os.listdir("/proc") if pid.isdigit()}
+
+
+def _kill_browser_processes(
+    logger: Logger, browser_processes: Dict[int, BrowserProcess]
+) -> None:
+    """
+    Terminates the reported browser and chromedriver processes that are still running
+    and kills those that do not exit in time.
+    Processes started after the report reuse the PID and are left alone.
+    """
+    # Most reported processes already exited, so skip them without querying each PID
+    existing = _running_pids()
+
+    procs: List[psutil.Process] = []
+    for browser_process in list(browser_processes.values()):
+        for pid in (browser_process.browser_pid, browser_process.driver_pid):
+            if pid not in existing:
+                continue
+            try:
+                proc = psutil.Process(pid)
+                if proc.create_time() <= browser_process.started:
+                    logger.warning(
+                        "Terminating remaining process %s of visit %s",
+                        pid,
+                        browser_process.visit_id,
+                    )
+                    proc.terminate()
+                    procs.append(proc)
+            except psutil.Error:
+                pass
+
+    _, alive = psutil.wait_procs(procs, timeout=3)
+    for proc in alive:
+        logger.warning("Killing remaining process %s", proc.pid)
+        try:
+            proc.kill()
+        except psutil.Error:
+            pass
+
+
+def _chrome_version(chrome_binary: Path) -> str:
+    """
+    Returns the version of the given chrome binary without starting a full browser.
+    The version is cached next to the binary as long as the binary is not modified.
+    """
+    cache_key = str(chrome_binary.stat().st_mtime)
+    try:
+        cached_key, cached_version = chrome_version_cache_path.read_text(
+            encoding="utf-8"
+        ).splitlines()
+        if cached_key == cache_key:
+            return cached_version
+    except (OSError, ValueError):
+        pass
+
+    version_output = subprocess.run(
+        [str(chrome_binary), "--version"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    match = chrome_version_pattern.match(version_output.strip())
+
+    if not match or not match.groups() or len(match.groups()) == 0:
+        raise RuntimeError(f"Unable to detect chrome version in {version_output}")
+
+    chrome_version = match.groups()[0]
+    try:
+        chrome_version_cache_path.write_text(
+            f"{cache_key}\n{chrome_version}\n", encoding="utf-8"
+        )
+    except OSError as e:
+        # E.g. a read-only chrome installation, the version is detected again next time
+        logging.getLogger("cookieblock-consent-crawler").debug(
+            "Unable to cache the chrome version: %s", e
+        )
+    return chrome_version
+
+
 def _parse_arguments() -> argparse.Namespace:
     """
     Parse the input arguments.
@@ -349,6 +802,12 @@ def _parse_arguments() -> argparse.Namespace:
     parser.add_argument(
         "--profile-tar", help="Location of a tar file containing the browser profile"
     )
+    parser.add_argument(
+        "--reset-profile",
+        help="Extract the profile tar even if the profile was already extracted from it",
+        action="store_true",
+        default=False,
+    )
     parser.add_argument(
         "--no-headless",
         help="Start the browser with GUI (headless disabled)",
@@ -367,12 +826,52 @@ def _parse_arguments() -> argparse.Namespace:
         default=10,
         type=int,
     )
+    parser.add_argument(
+        "--parallel-subpages",
+        help="Amount of subpages to load at the same time in separate tabs",
+        dest="parallel_subpages",
+        default=1,
+        type=int,
+    )
     parser.add_argument(
         "--timeout",
         help="Amount of seconds to spend on one website",
         default=600,
         type=int,
     )
+    parser.add_argument(
+        "--page-load-timeout",
+        help="Amount of seconds to wait for a single page to load",
+        dest="page_load_timeout",
+        default=23,
+        type=float,
+    )
+    parser.add_argument(
+        "--commit-every",
+        help="Maximum number of websites whose results are stored in one transaction",
+        dest="commit_every",
+        default=50,
+        type=int,
+    )
+    parser.add_argument(
+        "--max-visits-per-browser",
+        help="Number of websites a parallel browser process visits before it is restarted (0: never)",
+        dest="max_visits_per_browser",
+        default=50,
+        type=int,
+    )
+    parser.add_argument(
+        "--pin-cpus",
+        help="Pin each parallel browser to its own CPU (Linux only)",
+        action="store_true",
+        default=False,
+    )
+    parser.add_argument(
+        "--debug-resources",
+        help="Log the open files and connections of the crawler after each website",
+        action="store_true",
+        default=False,
+    )
 
     return parser.parse_args()
 
@@ -395,15 +894,40 @@ def _args_check(args: argparse.Namespace) -> None:
         raise ArgumentsException("Number of browsers must be at least 1")
     if args.num_subpages and args.num_subpages < 0:
         raise ArgumentsException("Number of subpages must be at least 0")
+    if args.parallel_subpages < 1:
+        raise ArgumentsException("Number of parallel subpages must be at least 1")
     if args.timeout and args.timeout < 0:
         raise ArgumentsException("Timeout must be at least 0")
+    if args.page_load_timeout <= 0:
+        raise ArgumentsException("Page load timeout must be greater than 0")
+    if args.commit_every < 1:
+        raise ArgumentsException("--commit-every must be at least 1")
+    if args.max_visits_per_browser < 0:
+        raise ArgumentsException("Number of visits per browser must be at least 0")
+    if args.pin_cpus and not hasattr(os, "sched_setaffinity"):
+        raise ArgumentsException("--pin-cpus is not supported on this platform")
 
     # checks with preparations
     if args.profile_tar:
         if not os.path.exists(args.profile_tar):
             raise ArgumentsException(f"File at {args.profile_tar} does not exist")
-        with tarfile.open(args.profile_tar, errorlevel=0) as tfile:
-            tfile.extractall(".", filter="data")
+        # Repeated runs (e.g. batches) reuse the profile extracted from the same tar
+        # as long as it was neither removed nor modified with --launch-browser
+        tar_stat = os.stat(args.profile_tar)
+        stamp = f"{os.path.abspath(args.profile_tar)}\n{tar_stat.st_size}\n{tar_stat.st_mtime}\n"
+        if (
+            args.reset_profile
+            or not chrome_profile_path.is_dir()
+            or not any(chrome_profile_path.iterdir())
+            or not chrome_profile_stamp_path.exists()
+            or chrome_profile_stamp_path.read_text(encoding="utf-8") != stamp
+        ):
+            # Clear existing profile to not mix it with the extracted one
+            chrome_profile_stamp_path.unlink(missing_ok=True)
+            shutil.rmtree(chrome_profile_path, ignore_errors=True)
+            with tarfile.open(args.profile_tar, errorlevel=0) as tfile:
+                tfile.extractall(".", filter="data")
+            chrome_profile_stamp_path.write_text(stamp, encoding="utf-8")
     else:
         # Simply use existing
         pass
@@ -457,33 +981,81 @@ def _database_setup(logger: Logger, args: argparse.Namespace) -> Tuple[str, str]
     return data_path, database_file
 
 
-def _kill_browsers_deamon(logger: Logger, args: argparse.Namespace) -> None:
+def _kill_browsers_deamon(
+    logger: Logger,
+    args: argparse.Namespace,
+    browser_processes: Dict[int, BrowserProcess],
+    stop: threading.Event,
+) -> None:
     """
-    Checks all running chrome processes.
+    Checks the running chrome processes until stop is set.
     Some processes that are spawned by this process launch the chromedriver and chrome processes.
     If these are killed the children of them (chrome/chromedriver) are adopted by the container.
-    We iterate over all processes and kill those that are too old.
+    As each worker leads its own process group, the group of an orphaned chrome is killed at once.
+    Other chrome processes are killed when they are too old.
+    The reported browser processes are checked on every tick, all processes
+    of the system only every `watcher_scan_interval` seconds. Visits whose
+    browser and chromedriver exited are no longer tracked.
     """
-    file = open("watcher.log", "a+")
+    # Written once per check instead of after every line
+    file = open("watcher.log", "a+", buffering=1 << 16)
 
     logger.info("Starting watcher")
 
-    while True:
+    last_scan = 0.0
+    while not stop.is_set():
         current_time = datetime.now()
 
         print("Checking at ", current_time, file=file)
 
+        existing = _running_pids()
+
+        procs: List[psutil.Process] = []
+        for visit_id, browser_process in list(browser_processes.items()):
+            pids = [
+                pid
+                for pid in (browser_process.browser_pid, browser_process.driver_pid)
+                if pid in existing
+            ]
+            if not pids:
+                del browser_processes[visit_id]
+                continue
+
+            for pid in pids:
+                try:
+                    tracked = psutil.Process(pid)
+                    # Otherwise the PID was reused by another process
+                    if tracked.create_time() <= browser_process.started:
+                        procs.append(tracked)
+                except psutil.NoSuchProcess:
+                    continue
+
         # Kill browser processes that are older than X minutes
         # Iterate over all processes as each pebble worker
         # is its own process, and if he dies the chrome/chromedriver child
         # process is adopted by the docker container init process.
+        if current_time.timestamp() - last_scan >= watcher_scan_interval:
+            last_scan = current_time.timestamp()
+            procs.extend(
+                p
+                for p in psutil.process_iter(["name", "create_time"])
+                if "chrome" in (p.info["name"] or "")
+            )
+
         proc: psutil.Process
 
-        for proc in psutil.process_iter():
+        for proc in procs:
             try:
                 if "chrome" not in proc.name():
                     continue
 
+                # The worker that started this browser is gone (e.g. killed by pebble)
+                pgid = os.getpgid(proc.pid)
+                if pgid != os.getpgid(0) and not psutil.pid_exists(pgid):
+                    print("Found orphaned process group: ", pgid, file=file)
+                    os.killpg(pgid, signal.SIGKILL)
+                    continue
+
                 # Kill if older than four times the timeout
                 if (
                     proc.create_time()
@@ -501,38 +1073,37 @@ def _kill_browsers_deamon(logger: Logger, args: argparse.Namespace) -> None:
                             print(e)
                             pass  # Zombie process might be gone by now
                     else:
-                        file.flush()
                         proc.kill()
                         proc.wait(timeout=10)
                         print("Killed", file=file)
                 else:
                     print("Process without starttime found: ", proc, file=file)
-                file.flush()
             except Exception as e:
                 print(e, file=file)
                 pass
 
-        file.flush()
-        time.sleep(10)
-
         print(file=file)
         file.flush()
 
+        stop.wait(watcher_interval)
+
 
-def run_crawler(logger: Logger) -> None:
+def run_crawler(
+    logger: Logger,
+    log_queue: queue.Queue[logging.LogRecord],
+    manager: multiprocessing.managers.SyncManager,
+) -> None:
     """
     This file contains all the main functionality and the entry point.
     """
-    # Clear existing profile
-    if os.path.exists(chrome_profile_path):
-        shutil.rmtree(chrome_profile_path)
-
-    os.makedirs(chrome_profile_path, exist_ok=True)
+    chrome_profile_path.mkdir(parents=True, exist_ok=True)
 
     args = _parse_arguments()
     _args_check(args)
 
     if args.launch_browser:
+        # The profile no longer matches the tar it was extracted from
+        chrome_profile_stamp_path.unlink(missing_ok=True)
         with Chrome(
             seconds_before_processing_page=1,
             headless=False,  # Definitely start headfull
@@ -579,9 +1150,19 @@ def run_crawler(logger: Logger) -> None:
     else:
         # Load new sites
         if args.file:
-            with open(args.file, "r", encoding="utf-8") as fo:
-                urls = [x.strip() for x in fo.readlines()]
-                urls = list(filter(lambda x: x.strip() != "", urls))
+            # Drops empty lines and duplicates but keeps the order of the file
+            lines = [
+                u
+                for x in Path(args.file).read_text(encoding="utf-8").splitlines()
+                if (u := x.strip())
+            ]
+            urls = list(dict.fromkeys(lines))
+            logger.info(
+                "Read %s URLs from %s (%s duplicates dropped)",
+                len(urls),
+                args.file,
+                len(lines) - len(urls),
+            )
         else:
             assert args.url
             urls = [args.url]
@@ -603,6 +1184,7 @@ def run_crawler(logger: Logger) -> None:
             "use_temp": True,
             "chrome_path": str(chrome_path.absolute()),
             "headless": not (args.no_headless),
+            "page_load_timeout": args.page_load_timeout,
         }
 
         # Add browser config to the database
@@ -615,146 +1197,186 @@ def run_crawler(logger: Logger) -> None:
         # Prepare all visits in one thread
         logger.info("Creating visits and browsers")
         with SessionLocal.begin() as session:
-            visits = [
-                SiteVisit(browser_id=browser_id, site_url=u, site_rank=-1) for u in urls
-            ]
-
-            session.add_all(visits)
+            # One INSERT for all visits which returns them with their ids
+            visits = list(
+                session.scalars(
+                    insert(SiteVisit).returning(SiteVisit, sort_by_parameter_order=True),
+                    [
+                        {"browser_id": browser_id, "site_url": u, "site_rank": -1}
+                        for u in urls
+                    ],
+                )
+            )
         logger.info("Created visits")
 
-        with SessionLocal.begin() as session:
-            for visit in tqdm(visits, desc="Populating visits"):
-                session.add(visit)
-                session.refresh(visit)
-                session.refresh(visit.browser)
-
         if args.batch_size > 0:
             visits = visits[: args.batch_size]
 
-    # Debugging
-    proc = psutil.Process()
-
-    watcher = Process(target=_kill_browsers_deamon, args=(logger, args), daemon=True)
-    watcher.start()
-
-    # Run a warmup browser to check if the current profile works
-    # Also patches the executable for patching the chromedriver executable
-    # to run concurrently and not need patching in each thread.
-    # Also prints the browser version.
-
-    logger.info("Starting warmup browser")
-    null_logger = logging.getLogger("empty")
-    null_logger.setLevel(logging.ERROR)
+    # Decided once for all browsers as the profile is the same for every visit
+    temp_profile_dir = temp_profile_parent(chrome_profile_path, args.num_browsers)
+    logger.info("Temporary profiles are stored in %s", temp_profile_dir or "default")
 
-    with Chrome(
-        seconds_before_processing_page=1,
-        chrome_profile_path=chrome_profile_path,
-        chromedriver_path=chromedriver_path,
+    # The same for all visits, so they are not sent to the workers with every visit
+    global crawl_settings
+    settings = CrawlSettings(
         browser_id=browser_id,
         crawl=crawl,
-        logger=null_logger,
-        **browser_params,  # type: ignore
-    ) as browser:
-        _, content = browser.get_content("chrome://version")
-
-        ver_pat = r"Chromium[\s]*\|[\s]*([\d\.]+)"
-        match = re.search(ver_pat, content)
-
-        if not match or not match.groups() or len(match.groups()) == 0:
-            raise RuntimeError(f"Unable to detect chrome version in {content}")
-
-        groups = match.groups()
-        logger.info("Chrome version: %s", groups[0])
-
-    if args.num_browsers == 1:
-        with SessionLocal.begin() as session:
-            crawl = session.merge(crawl)
-
-            for i, arg in enumerate(visits):
-                arg = session.merge(arg)
-
-                crawl_result, cds, cookies = run_domain_with_timeout(
-                    arg, browser_id, args.no_stdout, crawl, browser_params
-                )
-
-                logger.info("Finished %s/%s", i + 1, len(visits))
+        browser_params={**browser_params, "temp_profile_dir": temp_profile_dir},
+        no_stdout=args.no_stdout,
+        num_subpages=args.num_subpages,
+        parallel_subpages=args.parallel_subpages,
+        debug_resources=args.debug_resources,
+    )
+    crawl_settings = settings
+
+    # Browser processes started by this process or the pool workers are tracked
+    # to kill those that remain when the crawl stops
+    global browser_process_queue
+    process_queue: queue.Queue[Optional[BrowserProcess]] = manager.Queue()
+    browser_process_queue = process_queue
+    # Reported browser processes by visit id
+    browser_processes: Dict[int, BrowserProcess] = {}
+    collector = threading.Thread(
+        target=_collect_browser_processes,
+        args=(process_queue, browser_processes),
+        name="browser-process-collector",
+        daemon=True,
+    )
+    collector.start()
+
+    watcher_stop = threading.Event()
+    watcher = threading.Thread(
+        target=_kill_browsers_deamon,
+        args=(logger, args, browser_processes, watcher_stop),
+        name="watcher",
+        daemon=True,
+    )
+    watcher.start()
 
-                session.merge(crawl_result)
+    # Patch the chromedriver executable once so that the browsers
+    # running concurrently do not need patching in each process.
+    logger.info("Patching chromedriver")
+    patch_chromedriver(chromedriver_path)
+
+    logger.info("Chrome version: %s", _chrome_version(chrome_path / "chrome"))
+
+    # URLs to retry are written as soon as their visit failed, one per line
+    retry_list_path.parent.mkdir(parents=True, exist_ok=True)
+    retry_file = open(retry_list_path, "a", encoding="utf-8", buffering=1)
+
+    # Results are stored by a separate thread while the crawl continues
+    result_queue: queue.SimpleQueue[Optional[VisitResult]] = queue.SimpleQueue()
+    # Visits whose results could not be stored, filled by the writer
+    unstored: List[int] = []
+    writer = threading.Thread(
+        target=_write_results,
+        args=(result_queue, args.commit_every, unstored),
+        name="result-writer",
+    )
+    writer.start()
+    try:
+        if args.num_browsers == 1:
+            for i, arg in enumerate(tqdm(visits, desc="Crawling")):
+                # Resolve the next website while crawling this one
+                if i + 1 < len(visits):
+                    _prefetch_dns(visits[i + 1].site_url)
+
+                crawl_result, cds, cookies = run_domain_with_timeout(arg)
+
+                result_queue.put((crawl_result, cds, cookies))
+                if _needs_retry(crawl_result):
+                    retry_file.write(arg.site_url + "\n")
+            logger.info("%s crawls have finished.", len(visits))
+        else:
+            n_jobs = min(args.num_browsers, len(visits))
+
+            # Serializes the choice of CPUs between workers that start at the same time
+            cpu_lock = multiprocessing.Lock() if args.pin_cpus else None
+
+            # Workers are kept alive for multiple visits; each visit still starts its own
+            # browser with a fresh profile. Pebble replaces workers that time out or
+            # reached the maximum number of visits to bound their memory.
+            with ProcessPool(
+                max_workers=n_jobs,
+                max_tasks=args.max_visits_per_browser,
+                initializer=_init_worker,
+                initargs=(log_queue, process_queue, settings, cpu_lock),
+            ) as pool:
+                futures: Dict[Future, SiteVisit] = {
+                    pool.schedule(
+                        run_domain_with_timeout, args=(visit,), timeout=args.timeout
+                    ): visit
+                    for visit in visits
+                }
+
+                all_true = True
+                # Results are stored in the order in which the visits finish
+                for future in tqdm(
+                    as_completed(futures), total=len(visits), desc="Crawling"
+                ):
+                    visit = futures[future]
+                    try:
+                        crawl_result, cds, cookies = cast(VisitResult, future.result())
 
-                for cd in cds:
-                    session.merge(cd)
-                for c in cookies:
-                    session.merge(c)
-        logger.info("%s crawls have finished.", len(visits))
-    else:
-        n_jobs = min(args.num_browsers, len(visits))
-
-        with ProcessPool(max_workers=n_jobs, max_tasks=1) as pool:
-            fut = pool.map(
-                run_domain_with_timeout,
-                visits,
-                repeat(browser_id),
-                repeat(args.no_stdout),
-                repeat(crawl),
-                repeat(browser_params),
-                timeout=args.timeout,
-            )
+                        result_queue.put((crawl_result, cds, cookies))
+                        if _needs_retry(crawl_result):
+                            retry_file.write(visit.site_url + "\n")
 
-            all_true = True
-            it = fut.result()
-            try:
-                print("starting")
-                for i in tqdm(range(len(visits)), total=len(visits), desc="Crawling"):
-                    try:
-                        with SessionLocal.begin() as session:
-                            crawl_result, cds, cookies = cast(
-                                Tuple[
-                                    ConsentCrawlResult, List[ConsentData], List[Cookie]
-                                ],
-                                next(it),
-                            )
-
-                            session.merge(crawl_result)
-
-                            for cd in cds:
-                                session.merge(cd)
-                            for c in cookies:
-                                session.merge(c)
-
-                            # TODO: warn of unseccessfull crawls; if next_result[0].report
-                            # logger.warning("Crawl to %s finished", visits[i])
+                        # TODO: warn of unseccessfull crawls; if next_result[0].report
+                        # logger.warning("Crawl to %s finished", visit)
                     except TimeoutError as e:
-                        logger.warning("Crawl to %s froze", visits[i])
-
-                        with open("./retry_list.txt", "a", encoding="utf-8") as file:
-                            file.write(visits[i].site_url)
-                            file.write("\n")
+                        logger.warning("Crawl to %s froze", visit)
+                        retry_file.write(visit.site_url + "\n")
+                        all_true = False
                         logger.error(e)
+                    except CancelledError:
+                        logger.warning("Crawl to %s was cancelled", visit)
+                        retry_file.write(visit.site_url + "\n")
+                        all_true = False
+                    except ProcessExpired as e:
+                        # The worker died, e.g. killed by the OOM killer
+                        logger.error(
+                            "Worker crawling %s died with exit code %s",
+                            visit,
+                            e.exitcode,
+                        )
+                        retry_file.write(visit.site_url + "\n")
+                        all_true = False
                     except Exception as e:
-                        logger.error("Error when crawling %s", visits[i])
-                        with open("./retry_list.txt", "a", encoding="utf-8") as file:
-                            file.write(visits[i].site_url)
-                            file.write("\n")
+                        logger.error("Error when crawling %s", visit)
+                        retry_file.write(visit.site_url + "\n")
+                        all_true = False
                         logger.error(e)
-            except StopIteration:
-                pass
-
-            all_succeeded = all_true
-        logger.info(
-            "All %s crawls have finished. Success: %s", len(visits), all_succeeded
-        )
 
-    logger.info("Number of open files: %s", len(proc.open_files()))
-    for f in proc.open_files():
-        logger.info("\tOpen file: %s", f)
-    logger.info("Number of connections: %s", len(proc.net_connections()))
-    logger.info("fds: %s", proc.num_fds())
+                all_succeeded = all_true
+            logger.info(
+                "All %s crawls have finished. Success: %s", len(visits), all_succeeded
+            )
+    finally:
+        # Stores the remaining results
+        result_queue.put(None)
+        writer.join()
+
+        # Crawl the visits whose results were lost again
+        site_urls = {visit.visit_id: visit.site_url for visit in visits}
+        for visit_id in unstored:
+            retry_file.write(site_urls[visit_id] + "\n")
+        retry_file.close()
+
+        process_queue.put(None)
+        collector.join(queue_reader_stop_timeout)
+        if collector.is_alive():
+            logger.warning("Browser process collector did not stop in time")
+        _kill_browser_processes(logger, browser_processes)
+
+    logger.info("fds: %s", _count_fds())
+    if args.debug_resources:
+        _log_open_resources(logger)
 
     logger.info("CB-CCrawler has finished.")
-    logging.shutdown()
 
     logging.info("All browser should be stopped.")
-    watcher.kill()
+    watcher_stop.set()
 
 
 def main() -> None:
@@ -765,8 +1387,10 @@ def main() -> None:
     """
 
     logger = _setup_logger()
+    manager = _start_manager()
+    log_queue, log_listener = _start_log_listener(logger, manager)
     try:
-        run_crawler(logger)
+        run_crawler(logger, log_queue, manager)
 
     # pylint: disable=broad-exception-caught
     except CrawlerException as e:
@@ -775,6 +1399,12 @@ def main() -> None:
     except Exception as e:
         print(traceback.format_exc())
         sys.exit(1)
+    finally:
+        # Writes all remaining records, QueueListener.stop itself waits without a timeout
+        stopper = threading.Thread(target=log_listener.stop, daemon=True)
+        stopper.start()
+        stopper.join(queue_reader_stop_timeout)
+        manager.shutdown()
 
 
 if __name__ == "__main__":
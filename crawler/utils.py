@@ -3,6 +3,7 @@ from logging import Logger
 import re
 import sys
 import traceback
+from functools import lru_cache
 import requests
 import requests.exceptions
 from typing import Tuple, Optional, Dict, Any
@@ -36,8 +37,15 @@ def set_log_formatter(logger: Logger, fmt: str, date_format: str) -> None:
         handler.setFormatter(log_formatter)
 
 
+@lru_cache(maxsize=4096)
+def get_domain(url: str) -> str:
+    """
+    Returns the domain of the URL or host without its subdomains and public suffix.
+    Results are cached as the links of a website mostly share a few hosts.
+    """
+    return tldextract.extract(url).domain
+
+
 def is_on_same_domain(u1: str, u2: str) -> bool:
-    extract1 = tldextract.extract(u1)
-    extract2 = tldextract.extract(u2)
-    return extract1.domain == extract2.domain
+    return get_domain(u1) == get_domain(u2)
 
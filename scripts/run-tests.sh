@@ -5,6 +5,7 @@ set -e
 mypy --config=pyproject.toml \
       --ignore-missing-imports \
       crawler/run_consent_crawl_uc.py \
+      crawler/config.py \
       crawler/utils.py \
       crawler/browser.py \
       crawler/database.py \